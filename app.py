@@ -3,11 +3,14 @@
 """
 
 import os
-from fastapi import FastAPI, File, UploadFile
+from contextlib import asynccontextmanager
+from fastapi import BackgroundTasks, FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
 
 from utils.dicom_saver import DicomSaver
 
-app = FastAPI()
+# Largest request body accepted, in bytes
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 2 * 1024 * 1024 * 1024))
 
 dicom_saver = DicomSaver(
     s3_bucket=os.getenv("S3_BUCKET"),
@@ -17,20 +20,72 @@ dicom_saver = DicomSaver(
 )
 
 
-@app.post("/upload/")
-async def upload_file(file: UploadFile = File(...)):
-    # Read the contents of the file
-    contents = await file.read()
-    # Return file details
-    
-    dicom_saver.process_and_save(
-        dicom_bytes=contents,
-        filename=file.filename,
-    )
-    
-    return {"status": 200}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared S3 client and RDS batch writer on the server's event loop,
+    # close them on shutdown
+    await dicom_saver.start()
+    yield
+    await dicom_saver.close()
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects request bodies larger than max_bytes with 413, before they are spooled.
+
+    Requests whose Content-Length is over the limit are answered right away. For the
+    others the body is counted while it is received, so a missing or wrong
+    Content-Length cannot get more than max_bytes past it.
+
+    Args:
+        app: The ASGI application to wrap.
+        max_bytes (int): The largest request body accepted, in bytes.
+    """
+    def __init__(self, app, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
+        # Reject early from the declared size
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
 
+        total = 0
 
+        async def receive_limited():
+            nonlocal total
+            message = await receive()
+            if message["type"] == "http.request":
+                # Stop reading as soon as the body is over the limit
+                total += len(message.get("body", b""))
+                if total > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
 
+        await self.app(scope, receive_limited, send)
 
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
+
+@app.post("/upload/")
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    # Starlette already spooled the upload to a temporary file, use it without copying
+    await file.seek(0)
+
+    # Store the file first, its metadata is read back from S3 and saved to RDS after responding
+    await dicom_saver.save_to_s3_async(
+        fileobj=file.file,
+        filename=file.filename,
+    )
+    background_tasks.add_task(dicom_saver.save_metadata_from_s3_async, file.filename)
+
+    return {"status": 200}
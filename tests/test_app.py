@@ -0,0 +1,59 @@
+"""
+Tests for the upload size limit of the app, driving the ASGI middleware directly.
+"""
+
+import asyncio
+
+import pytest
+
+from fastapi import HTTPException
+
+from app import UploadSizeLimitMiddleware
+
+
+def run_request(middleware: UploadSizeLimitMiddleware, headers: list, chunks: list) -> list:
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages[-1]["more_body"] = False
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/upload/", "headers": headers}
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+
+async def read_body(scope, receive, send):
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+
+
+def test_declared_size_over_limit_is_rejected_without_reading_body():
+    async def app(scope, receive, send):
+        raise AssertionError("app must not be called")
+
+    sent = run_request(UploadSizeLimitMiddleware(app, max_bytes=10), [(b"content-length", b"11")], [b"x" * 11])
+
+    assert sent[0]["status"] == 413
+
+
+def test_body_over_limit_is_rejected_while_streaming():
+    middleware = UploadSizeLimitMiddleware(read_body, max_bytes=10)
+
+    with pytest.raises(HTTPException) as error:
+        run_request(middleware, [], [b"x" * 6, b"x" * 6])
+
+    assert error.value.status_code == 413
+
+
+def test_body_within_limit_is_passed_through():
+    sent = run_request(UploadSizeLimitMiddleware(read_body, max_bytes=10), [(b"content-length", b"10")], [b"x" * 5, b"x" * 5])
+
+    assert sent[0]["status"] == 200
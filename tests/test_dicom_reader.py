@@ -0,0 +1,105 @@
+"""
+Tests for the query building of RdsDataFetcher, which needs no database connection.
+"""
+
+import importlib
+
+import boto3
+import psycopg2
+import pytest
+
+from psycopg2 import sql
+
+from utils import dicom_reader
+from utils.dicom_reader import RdsDataFetcher
+
+
+def create_fetcher() -> RdsDataFetcher:
+    return RdsDataFetcher("db", "user", "password", "host", "5432")
+
+
+def test_names_are_identifiers_and_values_are_parameters():
+    query, params = create_fetcher().build_query(
+        "public.dicom_metadata",
+        filters={"Modality": "CT", "x; DROP TABLE y": 1},
+        sort_by="Study Date",
+        sort_order="desc",
+        page_size=10,
+    )
+
+    assert sql.Identifier("public", "dicom_metadata") in query.seq
+    assert "Identifier('x; DROP TABLE y')" in repr(query)
+    assert "Identifier('Study Date')" in repr(query)
+    assert params == ["CT", 1, 10]
+
+
+def test_invalid_sort_order_is_rejected():
+    with pytest.raises(ValueError):
+        create_fetcher().build_query("t", sort_by="c", sort_order="desc; DROP TABLE t")
+
+
+def test_next_page_starts_after_key_without_offset():
+    query, params = create_fetcher().build_query(
+        "t",
+        sort_by="c",
+        sort_order="asc",
+        page_size=5,
+        after_key=("2024-01-01", 42),
+    )
+
+    assert "OFFSET" not in repr(query)
+    assert "SQL('>')" in repr(query)
+    assert params == ["2024-01-01", 42, 5]
+
+
+def test_descending_pages_compare_backwards():
+    query, _ = create_fetcher().build_query("t", sort_by="c", sort_order="desc", after_key=(1, 2))
+
+    assert "SQL('<')" in repr(query)
+
+
+def test_ascending_pages_include_null_sort_values_after_all_values():
+    query, params = create_fetcher().build_query("t", sort_by="c", page_size=5, after_key=("x", 42))
+
+    assert "IS NULL" in repr(query)
+    assert "ASC NULLS LAST" in repr(query)
+    assert params == ["x", 42, 5]
+
+
+def test_null_sort_value_in_cursor_continues_among_nulls():
+    fetcher = create_fetcher()
+    fetcher._execute = lambda query, params: ([(7, None), (9, None)], ["id", "c"])
+
+    rows, after_key = fetcher.fetch_page("t", sort_by="c", page_size=2)
+    query, params = fetcher.build_query("t", sort_by="c", page_size=2, after_key=after_key)
+
+    assert after_key == (None, 9)
+    assert "IS NULL AND" in repr(query)
+    assert params == [9, 2]
+
+
+def test_descending_null_cursor_continues_with_values():
+    query, params = create_fetcher().build_query("t", sort_by="c", sort_order="desc", after_key=(None, 9))
+
+    assert "IS NOT NULL OR" in repr(query)
+    assert "DESC NULLS FIRST" in repr(query)
+    assert params == [9, 10]
+
+
+def test_cursor_columns_add_key_column_as_tie_breaker():
+    assert RdsDataFetcher.cursor_columns("c") == ["c", "id"]
+    assert RdsDataFetcher.cursor_columns(None) == ["id"]
+    assert RdsDataFetcher.cursor_columns("id") == ["id"]
+
+
+def test_import_and_construction_create_no_clients(monkeypatch):
+    created = []
+    monkeypatch.setattr(boto3, "client", lambda *args, **kwargs: created.append(args))
+    monkeypatch.setattr(psycopg2, "connect", lambda *args, **kwargs: created.append(kwargs))
+
+    # Importing runs the module body again, the example must not run
+    reader_module = importlib.reload(dicom_reader)
+    reader_module.DicomReader("bucket", "key")
+    reader_module.RdsDataFetcher("db", "user", "password", "host", "5432")
+
+    assert created == []
@@ -0,0 +1,259 @@
+"""
+Tests for DicomSaver, using a fake save_to_rds instead of a database and a fake S3 client.
+"""
+
+import asyncio
+import io
+import threading
+
+import boto3
+import psycopg2
+import pytest
+
+from pydicom.data import get_testdata_file
+
+from utils import dicom_saver
+from utils.dicom_saver import DicomSaver
+
+
+class FakeRds:
+    """
+    Records the batches passed to save_to_rds, and fails any batch containing a bad row.
+    """
+    def __init__(self, bad_rows=()):
+        self.bad_rows = set(bad_rows)
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def save_to_rds(self, dicom_metadata, query):
+        with self._lock:
+            self.batches.append(list(dicom_metadata))
+        if self.bad_rows.intersection(dicom_metadata):
+            raise ValueError("bad row")
+
+
+def create_saver(fake_rds: FakeRds) -> DicomSaver:
+    saver = DicomSaver(
+        s3_bucket="bucket",
+        region_name="us-east-1",
+        access_key_id="key",
+        secret_access_key="secret",
+    )
+    saver.save_to_rds = fake_rds.save_to_rds
+    return saver
+
+
+async def save_rows(saver: DicomSaver, rows: list) -> list:
+    await saver.start()
+    try:
+        return await asyncio.gather(
+            *[saver.save_to_rds_async(row) for row in rows],
+            return_exceptions=True
+        )
+    finally:
+        await saver.close()
+
+
+def test_concurrent_rows_are_saved_in_one_batch():
+    fake_rds = FakeRds()
+    saver = create_saver(fake_rds)
+
+    results = asyncio.run(save_rows(saver, [(i,) for i in range(10)]))
+
+    assert results == [None] * 10
+    assert fake_rds.batches == [[(i,) for i in range(10)]]
+
+
+def test_bad_row_only_fails_its_own_upload():
+    fake_rds = FakeRds(bad_rows=[(3,)])
+    saver = create_saver(fake_rds)
+
+    results = asyncio.run(save_rows(saver, [(i,) for i in range(5)]))
+
+    assert isinstance(results[3], ValueError)
+    assert results[:3] + results[4:] == [None] * 4
+
+
+def test_saver_can_run_on_successive_event_loops():
+    fake_rds = FakeRds()
+    saver = create_saver(fake_rds)
+
+    asyncio.run(save_rows(saver, [(1,)]))
+    asyncio.run(save_rows(saver, [(2,)]))
+
+    assert fake_rds.batches == [[(1,)], [(2,)]]
+
+
+def test_save_requires_start():
+    saver = create_saver(FakeRds())
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(saver.save_to_rds_async((1,)))
+
+
+def test_close_saves_rows_of_batch_being_collected(monkeypatch):
+    monkeypatch.setattr(dicom_saver, "RDS_BATCH_INTERVAL", 10)
+    fake_rds = FakeRds()
+    saver = create_saver(fake_rds)
+
+    async def close_while_collecting():
+        await saver.start()
+        saving = asyncio.create_task(saver.save_to_rds_async((1,)))
+        # Let the writer take the row off the queue and wait for more
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(saver.close(), 1)
+        assert saving.done() and saving.result() is None
+
+    asyncio.run(close_while_collecting())
+
+    assert fake_rds.batches == [[(1,)]]
+
+
+def test_cancelled_writer_fails_rows_of_batch_being_collected(monkeypatch):
+    monkeypatch.setattr(dicom_saver, "RDS_BATCH_INTERVAL", 10)
+    fake_rds = FakeRds()
+    saver = create_saver(fake_rds)
+
+    async def cancel_while_collecting():
+        await saver.start()
+        saving = asyncio.create_task(saver.save_to_rds_async((1,)))
+        await asyncio.sleep(0.01)
+        saver._rds_writer.cancel()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(saving, 1)
+        await saver.close()
+
+    asyncio.run(cancel_while_collecting())
+
+    assert fake_rds.batches == []
+
+
+def test_construction_creates_no_clients(monkeypatch):
+    created = []
+    monkeypatch.setattr(boto3, "client", lambda *args, **kwargs: created.append(args))
+    monkeypatch.setattr(psycopg2, "connect", lambda *args, **kwargs: created.append(kwargs))
+
+    create_saver(FakeRds())
+
+    assert created == []
+
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeS3:
+    """
+    Serves one stored object, honouring Range requests like S3 does.
+    """
+    def __init__(self, data: bytes):
+        self.data = data
+        self.ranges = []
+
+    async def get_object(self, Bucket, Key, Range=None):
+        self.ranges.append(Range)
+        if Range is None:
+            return {'Body': FakeBody(self.data)}
+        start, end = map(int, Range[len("bytes="):].split("-"))
+        part = self.data[start:end + 1]
+        return {
+            'Body': FakeBody(part),
+            'ContentRange': f"bytes {start}-{start + len(part) - 1}/{len(self.data)}",
+        }
+
+
+def read_metadata_from_s3(prefix_bytes: int, monkeypatch) -> tuple:
+    with open(get_testdata_file("CT_small.dcm"), "rb") as f:
+        data = f.read()
+    monkeypatch.setattr(dicom_saver, "METADATA_PREFIX_BYTES", prefix_bytes)
+    saver = create_saver(FakeRds())
+    fake_s3 = saver._s3_async_client = FakeS3(data)
+
+    row = asyncio.run(saver.read_metadata_from_s3_async("CT_small"))
+
+    assert row == saver.prepare_metadata(io.BytesIO(data))
+    return fake_s3.ranges
+
+
+def test_metadata_is_read_from_start_of_stored_file(monkeypatch):
+    # The pixel data of CT_small.dcm starts at byte 6300
+    assert read_metadata_from_s3(8192, monkeypatch) == ["bytes=0-8191"]
+
+
+def test_whole_file_is_fetched_when_metadata_is_longer_than_prefix(monkeypatch):
+    assert read_metadata_from_s3(4096, monkeypatch) == ["bytes=0-4095", None]
+
+
+def test_file_smaller_than_prefix_is_fetched_once(monkeypatch):
+    assert read_metadata_from_s3(1024 * 1024, monkeypatch) == ["bytes=0-1048575"]
+
+
+class FakeMultipartS3:
+    """
+    Stores multipart uploads, rejecting parts and completions whose CRC32C is missing or wrong like S3 does.
+    """
+    def __init__(self, failing_part=None):
+        self.failing_part = failing_part
+        self.parts = {}
+        self.data = None
+        self.aborted = False
+
+    async def create_multipart_upload(self, Bucket, Key, ChecksumAlgorithm):
+        assert ChecksumAlgorithm == 'CRC32C'
+        return {'UploadId': "upload"}
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, ChecksumCRC32C):
+        if PartNumber == self.failing_part:
+            raise ConnectionError("part failed")
+        if ChecksumCRC32C != dicom_saver.crc32c_checksum(Body):
+            raise ValueError("BadDigest")
+        self.parts[PartNumber] = (Body, ChecksumCRC32C)
+        return {'ETag': f"etag-{PartNumber}"}
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        for part in MultipartUpload['Parts']:
+            if part['ChecksumCRC32C'] != self.parts[part['PartNumber']][1]:
+                raise ValueError("InvalidPart")
+        self.data = b"".join(self.parts[part['PartNumber']][0] for part in MultipartUpload['Parts'])
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+
+
+def upload_multipart(fake_s3: FakeMultipartS3, data: bytes, monkeypatch) -> None:
+    monkeypatch.setattr(dicom_saver, "MULTIPART_THRESHOLD", 1024)
+    monkeypatch.setattr(dicom_saver, "MULTIPART_CHUNKSIZE", 1024)
+    saver = create_saver(FakeRds())
+    saver._s3_async_client = fake_s3
+
+    asyncio.run(saver.save_to_s3_async(io.BytesIO(data), "large"))
+
+
+def test_large_upload_sends_crc32c_of_every_part(monkeypatch):
+    data = bytes(range(256)) * 10
+    fake_s3 = FakeMultipartS3()
+
+    upload_multipart(fake_s3, data, monkeypatch)
+
+    assert fake_s3.data == data
+    assert sorted(fake_s3.parts) == [1, 2, 3]
+
+
+def test_failed_part_aborts_large_upload(monkeypatch):
+    fake_s3 = FakeMultipartS3(failing_part=2)
+
+    with pytest.raises(ConnectionError):
+        upload_multipart(fake_s3, bytes(5000), monkeypatch)
+
+    assert fake_s3.aborted
+    assert fake_s3.data is None
@@ -3,15 +3,37 @@
 """
 
 # Import dependencies
+import os
+import functools
+import threading
 import boto3
 import io
 import pydicom
-import psycopg2
-import matplotlib.pyplot as plt
+import tempfile
+import numpy as np
+
+from PIL import Image
+from pydicom.pixel_data_handlers.util import apply_voi_lut
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+from typing import List, Tuple
+
+# Sort orders accepted by RdsDataFetcher.build_query
+SORT_ORDERS = ('ASC', 'DESC')
+
+# Ranged download settings for S3, large files are fetched in parallel parts
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+MAX_CONCURRENCY = 16
+
+# In-memory limit of the download buffer, larger files spill to disk
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
 
 class DicomReader:
     """
-    A class to read DICOM files from an S3 bucket and display them as plots.
+    A class to read DICOM files from an S3 bucket and display them as images.
 
     Args:
         s3_bucket (str): The name of the S3 bucket.
@@ -24,7 +46,16 @@ class DicomReader:
     def __init__(self, s3_bucket: str, s3_object_key: str) -> None:
         self.s3_bucket = s3_bucket
         self.s3_object_key = s3_object_key
-        self.s3_client = boto3.client('s3')
+        self._transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=MAX_CONCURRENCY
+        )
+
+    @functools.cached_property
+    def s3_client(self):
+        # Created on first use, constructing it loads botocore's service models
+        return boto3.client('s3', config=Config(max_pool_connections=MAX_CONCURRENCY))
 
     def read_dicom_from_s3(self) -> pydicom.dataset.FileDataset:
         """
@@ -34,24 +65,71 @@ class DicomReader:
             pydicom.dataset.FileDataset: The DICOM dataset.
         """
         try:
-            # Get DICOM file from S3
-            response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=self.s3_object_key)
-            dicom_bytes = response['Body'].read()
-            dicom_dataset = pydicom.dcmread(io.BytesIO(dicom_bytes))
+            # Get DICOM file from S3, as parallel ranged GETs when large
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+                self.s3_client.download_fileobj(
+                    self.s3_bucket,
+                    self.s3_object_key,
+                    buffer,
+                    Config=self._transfer_config
+                )
+                buffer.seek(0)
+                dicom_dataset = pydicom.dcmread(buffer)
             return dicom_dataset
         except Exception as e:
             print(f"Error reading DICOM file from S3: {e}")
 
     def show_dicom_plot(self) -> None:
         """
-        Displays the DICOM image as a plot.
+        Displays the DICOM image with the system image viewer.
+        """
+        dicom_dataset = self.read_dicom_from_s3()
+        if dicom_dataset:
+            self.to_image(dicom_dataset).show(title="DICOM Image")
+
+    def render_png(self) -> bytes:
+        """
+        Renders the DICOM image as PNG.
+
+        Returns:
+            bytes: The PNG encoded image, or None if the DICOM file could not be read.
         """
         dicom_dataset = self.read_dicom_from_s3()
         if dicom_dataset:
-            plt.imshow(dicom_dataset.pixel_array, cmap=plt.cm.bone)
-            plt.title("DICOM Image")
-            plt.axis('off')
-            plt.show()
+            output = io.BytesIO()
+            self.to_image(dicom_dataset).save(output, 'PNG')
+            return output.getvalue()
+
+    @staticmethod
+    def to_image(dicom_dataset: pydicom.dataset.FileDataset) -> Image.Image:
+        """
+        Converts the pixel data of a DICOM dataset to an 8-bit image, applying its VOI LUT or windowing.
+
+        Args:
+            dicom_dataset (pydicom.dataset.FileDataset): The DICOM dataset.
+
+        Returns:
+            Image.Image: The image of the first frame.
+        """
+        pixels = dicom_dataset.pixel_array
+
+        # Keep the first frame of multi-frame images
+        if int(dicom_dataset.get('NumberOfFrames', 1) or 1) > 1:
+            pixels = pixels[0]
+
+        if dicom_dataset.get('SamplesPerPixel', 1) != 1:
+            # Color images only need their samples reduced to 8 bits
+            shift = max(int(dicom_dataset.get('BitsStored', 8)) - 8, 0)
+            return Image.fromarray((pixels >> shift).astype(np.uint8))
+
+        # Apply the VOI LUT or window, then scale to the 8-bit range
+        pixels = apply_voi_lut(pixels, dicom_dataset).astype(np.float64)
+        pixels -= pixels.min()
+        if pixels.max() > 0:
+            pixels *= 255.0 / pixels.max()
+        if dicom_dataset.get('PhotometricInterpretation') == 'MONOCHROME1':
+            pixels = 255.0 - pixels
+        return Image.fromarray(pixels.astype(np.uint8))
 
 
 class RdsDataFetcher:
@@ -64,106 +142,231 @@ class RdsDataFetcher:
         db_password (str): The password to connect to the database.
         db_host (str): The hostname of the database.
         db_port (str): The port of the database.
+        min_connections (int): The minimum number of pooled connections.
+        max_connections (int): The maximum number of pooled connections.
 
     """
-    def __init__(self, db_name: str, db_user: str, db_password: str, db_host: str, db_port: str) -> None:
+    def __init__(self, db_name: str, db_user: str, db_password: str, db_host: str, db_port: str, min_connections: int = 1, max_connections: int = 20) -> None:
         self.db_name = db_name
         self.db_user = db_user
         self.db_password = db_password
         self.db_host = db_host
         self.db_port = db_port
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self._pool = None
+        self._pool_lock = threading.Lock()
 
-    def build_query(self, base_query: str, filters: dict = None, sort_by: str = None, sort_order: str = 'asc', page: int = 1, page_size: int = 10) -> str:
+    @property
+    def pool(self) -> ThreadedConnectionPool:
+        """
+        The connection pool of the RDS instance, connected on first use.
         """
-        Builds the SQL query based on the provided parameters.
+        # Threads may ask for the pool at the same time, only one may create it
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(self.min_connections, self.max_connections, database=self.db_name, user=self.db_user, password=self.db_password, host=self.db_host, port=self.db_port)
+            return self._pool
+
+    def build_query(self, table_name: str, filters: dict = None, sort_by: str = None, sort_order: str = 'asc', page_size: int = 10, after_key: tuple = None, key_column: str = 'id') -> Tuple[sql.Composed, list]:
+        """
+        Builds the SQL query based on the provided parameters. Table and column names are
+        quoted as identifiers and all values are passed as query parameters.
+
+        Pages are selected with keyset pagination: rows are ordered by sort_by and then by
+        key_column, and each page starts right after the sort values of the previous page's
+        last row, so the database never scans and discards the rows of earlier pages.
+        NULL sort values come last in ascending order and first in descending order, as in
+        PostgreSQL's default order, and may appear in the cursor.
 
         Args:
-            base_query (str): The base SQL query to build upon.
+            table_name (str): The table to select from, optionally schema-qualified.
             filters (dict): A dictionary containing filter conditions.
-            sort_by (str): The column to sort by.
+            sort_by (str): The column to sort by, should be indexed together with key_column.
             sort_order (str): The sort order ('asc' or 'desc').
-            page (int): The page number for pagination (1-based index).
             page_size (int): The number of records per page.
+            after_key (tuple): The cursor returned with the previous page, None for the first page.
+            key_column (str): The unique column used to break ties between equal sort values.
 
         Returns:
-            str: The constructed SQL query.
+            Tuple[sql.Composed, list]: The constructed SQL query and its parameter values.
         """
-        query = base_query
+        if sort_order.upper() not in SORT_ORDERS:
+            raise ValueError(f"Invalid sort order: {sort_order}")
+        ascending = sort_order.upper() == 'ASC'
+        direction = sql.SQL("ASC NULLS LAST" if ascending else "DESC NULLS FIRST")
+
+        query = sql.SQL("SELECT * FROM {}").format(sql.Identifier(*table_name.split(".")))
+        params = []
+        conditions = []
 
         # Build SQL query with filters
         if filters:
-            filter_conditions = []
             for key, value in filters.items():
-                filter_conditions.append(f"{key} = %s")
-            filter_clause = " AND ".join(filter_conditions)
-            query += f" WHERE {filter_clause}"
+                conditions.append(sql.SQL("{} = %s").format(sql.Identifier(key)))
+                params.append(value)
+
+        # Columns identifying a row's position in the sort order
+        cursor_columns = [sql.Identifier(column) for column in self.cursor_columns(sort_by, key_column)]
+
+        # Start after the last row of the previous page
+        if after_key is not None:
+            condition, after_params = self.after_key_condition(cursor_columns, after_key, ascending)
+            conditions.append(condition)
+            params.extend(after_params)
+
+        if conditions:
+            query += sql.SQL(" WHERE {}").format(sql.SQL(" AND ").join(conditions))
 
         # Add sorting
-        if sort_by:
-            query += f" ORDER BY {sort_by} {sort_order}"
+        query += sql.SQL(" ORDER BY {}").format(
+            sql.SQL(", ").join(sql.SQL("{} {}").format(column, direction) for column in cursor_columns)
+        )
 
         # Add pagination
-        if page and page_size:
-            offset = (page - 1) * page_size
-            query += f" OFFSET {offset} LIMIT {page_size}"
+        if page_size:
+            query += sql.SQL(" LIMIT %s")
+            params.append(page_size)
 
-        return query
+        return query, params
 
-    def fetch_data(self, query: str, filter_values: list = None) -> list:
+    @staticmethod
+    def cursor_columns(sort_by: str = None, key_column: str = 'id') -> List[str]:
+        """
+        Returns the columns whose values form the pagination cursor.
+
+        Args:
+            sort_by (str): The column to sort by.
+            key_column (str): The unique column used to break ties between equal sort values.
+
+        Returns:
+            List[str]: The cursor columns, in sort order.
+        """
+        return [sort_by, key_column] if sort_by and sort_by != key_column else [key_column]
+
+    @staticmethod
+    def after_key_condition(cursor_columns: List[sql.Identifier], after_key: tuple, ascending: bool) -> Tuple[sql.Composed, list]:
+        """
+        Builds the condition selecting the rows after a cursor. The key column is unique and
+        never NULL, the sort column may be NULL in the rows and in the cursor.
+
+        Args:
+            cursor_columns (List[sql.Identifier]): The cursor columns, in sort order.
+            after_key (tuple): The cursor values of the previous page's last row.
+            ascending (bool): Whether rows are sorted in ascending order.
+
+        Returns:
+            Tuple[sql.Composed, list]: The condition and its parameter values.
+        """
+        comparison = sql.SQL(">" if ascending else "<")
+        if len(cursor_columns) == 1:
+            return sql.SQL("{} {} %s").format(cursor_columns[0], comparison), list(after_key)
+
+        sort_column, key_column = cursor_columns
+        sort_value, key_value = after_key
+        # A row comparison is NULL when a sort value is NULL, so NULLs are compared explicitly
+        if sort_value is None:
+            # The cursor is among the NULLs, which come before all values in descending order
+            condition = "({sort} IS NULL AND {key} > %s)" if ascending else "({sort} IS NOT NULL OR {key} < %s)"
+            return sql.SQL(condition).format(sort=sort_column, key=key_column), [key_value]
+
+        condition = sql.SQL("({}, {}) {} (%s, %s)").format(sort_column, key_column, comparison)
+        if ascending:
+            # NULLs come after all values in ascending order
+            condition = sql.SQL("({} OR {} IS NULL)").format(condition, sort_column)
+        return condition, [sort_value, key_value]
+
+    def fetch_data(self, query: sql.Composable, params: list = None) -> list:
         """
         Fetches data from the RDS instance based on the provided query.
 
         Args:
-            query (str): The SQL query to fetch data from the database.
-            filter_values (list): A list containing values for filter conditions.
+            query (sql.Composable): The SQL query to fetch data from the database.
+            params (list): A list containing values for the query parameters.
 
         Returns:
             list: A list of tuples containing the fetched data.
         """
         try:
-            # Connect to RDS instance
-            conn = psycopg2.connect(database=self.db_name, user=self.db_user, password=self.db_password, host=self.db_host, port=self.db_port)
-            cursor = conn.cursor()
-
-            # Execute SQL query
-            cursor.execute(query, filter_values)
-            data = cursor.fetchall()
-
+            data, _ = self._execute(query, params)
             return data
         except Exception as e:
             print(f"Error fetching data from RDS: {e}")
+
+    def fetch_page(self, table_name: str, filters: dict = None, sort_by: str = None, sort_order: str = 'asc', page_size: int = 10, after_key: tuple = None, key_column: str = 'id') -> Tuple[list, tuple]:
+        """
+        Fetches one page of data and the cursor of the next page. See build_query for the arguments.
+
+        Returns:
+            Tuple[list, tuple]: The fetched rows, and the after_key to pass for the next page,
+                or None if this is the last page.
+        """
+        query, params = self.build_query(table_name, filters=filters, sort_by=sort_by, sort_order=sort_order, page_size=page_size, after_key=after_key, key_column=key_column)
+        data, column_names = self._execute(query, params)
+
+        # The next page starts after the cursor values of the last row
+        next_after_key = None
+        if data and page_size and len(data) == page_size:
+            indexes = [column_names.index(column) for column in self.cursor_columns(sort_by, key_column)]
+            next_after_key = tuple(data[-1][index] for index in indexes)
+        return data, next_after_key
+
+    def _execute(self, query: sql.Composable, params: list = None) -> Tuple[list, List[str]]:
+        """
+        Executes a query on a pooled connection.
+
+        Args:
+            query (sql.Composable): The SQL query to execute.
+            params (list): A list containing values for the query parameters.
+
+        Returns:
+            Tuple[list, List[str]]: The fetched rows and the names of their columns.
+        """
+        # Borrow a connection to the RDS instance from the pool
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                # Execute SQL query
+                cursor.execute(query, params)
+                data = cursor.fetchall()
+                column_names = [column.name for column in cursor.description]
+
+            return data, column_names
         finally:
-            # Close cursor and connection
-            cursor.close()
-            conn.close()
-
-# Example usage:
-# Initialize RdsDataFetcher with RDS credentials
-db_name = "your_db"
-db_user = "your_user"
-db_password = "your_password"
-db_host = "your_host"
-db_port = "your_port"
-fetcher = RdsDataFetcher(db_name, db_user, db_password, db_host, db_port)
-
-# Example base query
-base_query = "SELECT * FROM your_table"
-
-# Example filters
-filters = {"column1": "value1", "column2": "value2"}
-
-# Example sorting
-sort_by = "column3"
-sort_order = "desc"
-
-# Example pagination
-page = 1
-page_size = 10
-
-# Build the query
-query = fetcher.build_query(base_query, filters=filters, sort_by=sort_by, sort_order=sort_order, page=page, page_size=page_size)
-
-# Fetch data from RDS
-filter_values = list(filters.values()) if filters else None
-data = fetcher.fetch_data(query, filter_values)
-print(data)
+            try:
+                # End the read transaction
+                if not conn.closed:
+                    conn.rollback()
+            finally:
+                # Return connection to the pool, discarding it if it was closed
+                self.pool.putconn(conn, close=bool(conn.closed))
+
+if __name__ == "__main__":
+    # Example usage:
+    # Initialize RdsDataFetcher with RDS credentials
+    db_name = os.getenv("DATABASE")
+    db_user = os.getenv("USER")
+    db_password = os.getenv("PASSWORD")
+    db_host = os.getenv("HOST")
+    db_port = os.getenv("PORT")
+    fetcher = RdsDataFetcher(db_name, db_user, db_password, db_host, db_port)
+
+    # Example table
+    table_name = "your_table"
+
+    # Example filters
+    filters = {"column1": "value1", "column2": "value2"}
+
+    # Example sorting
+    sort_by = "column3"
+    sort_order = "desc"
+
+    # Example pagination
+    page_size = 10
+
+    # Fetch the first two pages from RDS
+    data, after_key = fetcher.fetch_page(table_name, filters=filters, sort_by=sort_by, sort_order=sort_order, page_size=page_size)
+    print(data)
+    if after_key is not None:
+        data, after_key = fetcher.fetch_page(table_name, filters=filters, sort_by=sort_by, sort_order=sort_order, page_size=page_size, after_key=after_key)
+        print(data)
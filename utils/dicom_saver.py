@@ -13,40 +13,244 @@ Example usage:
     s3_bucket = "your-s3-bucket"
     saver = DicomSaver(rds_instance, s3_bucket)
 
-    # Read DICOM file as bytes
+    # Process and save DICOM file from an open file object
     with open("example.dcm", "rb") as f:
-        dicom_bytes = f.read()
-
-    # Process and save DICOM file
-    saver.process_and_save(dicom_bytes, "example.dcm")
+        saver.process_and_save(f, "example.dcm")
 """
 
 import os
+import asyncio
+import base64
+import functools
+import threading
+import aioboto3
 import boto3
-import io
 import pydicom
-import json
-import psycopg2
+import tempfile
 
-from typing import List, Tuple
+from awscrt.checksums import crc32c
+from contextlib import AsyncExitStack
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from pydicom.datadict import DicomDictionary
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from typing import BinaryIO, List, Tuple
 
 from utils.logger import create_logger
 
 _logger = create_logger(logger_name="DicomSaver")
 
+# Multipart upload settings for S3
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+MAX_CONCURRENCY = 8
+
+# Bytes fetched from the start of a stored DICOM file to read its metadata, which comes
+# before the pixel data. The whole file is fetched when its metadata is longer
+METADATA_PREFIX_BYTES = 1024 * 1024
+
+# Size of each chunk read from S3 and the in-memory limit of download buffers
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Have S3 verify uploads with a CRC32C checksum, computed by awscrt while the body is sent
+CHECKSUM_ARGS = {'ChecksumAlgorithm': 'CRC32C'}
+
+
+def crc32c_checksum(data: bytes) -> str:
+    """
+    Returns the CRC32C checksum of data, base64-encoded as S3 expects it.
+
+    Args:
+        data (bytes): The data to checksum.
+
+    Returns:
+        str: The base64-encoded big-endian CRC32C.
+    """
+    return base64.b64encode(crc32c(data).to_bytes(4, 'big')).decode()
+
+# Connection pool, keep-alive and retry settings of the S3 clients, shared by all requests
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 5}
+)
+
+# Size limits of the RDS connection pool
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 20
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Metadata rows are written to RDS in batches of up to RDS_BATCH_SIZE rows,
+# waiting at most RDS_BATCH_INTERVAL seconds for a batch to fill up
+RDS_BATCH_SIZE = 100
+RDS_BATCH_INTERVAL = 0.05
+
+# Queued by close after the last row, the batch writer saves everything before it and stops
+_RDS_WRITER_STOP = object()
+
+# Columns of the metadata table, in the order they are inserted
+METADATA_COLUMNS = (
+    'Accession Number',
+    'Acquisition Date',
+    'Acquisition Matrix',
+    'Acquisition Number',
+    'Acquisition Time',
+    'Angio Flag',
+    'Bits Allocated',
+    'Bits Stored',
+    'Columns',
+    'Content Date',
+    'Content Time',
+    'Date of Last Calibration',
+    'De-identification Method',
+    'Derivation Description',
+    'Echo Time',
+    'Echo Train Length',
+    'Flip Angle',
+    'Frame of Reference UID',
+    'High Bit',
+    'Image Comments',
+    'Image Orientation (Patient)',
+    'Image Position (Patient)',
+    'Image Type',
+    'Imaged Nucleus',
+    'Imaging Frequency',
+    'In-plane Phase Encoding Direction',
+    'Instance Creation Date',
+    'Instance Creation Time',
+    'Instance Creator UID',
+    'Instance Number',
+    'Largest Image Pixel Value',
+    'Lossy Image Compression',
+    'Lossy Image Compression Ratio',
+    'MR Acquisition Type',
+    'Magnetic Field Strength',
+    'Manufacturer',
+    "Manufacturer's Model Name",
+    'Modality',
+    'Number of Averages',
+    'Number of Phase Encoding Steps',
+    'Patient ID',
+    'Patient Identity Removed',
+    'Patient Position',
+    "Patient's Age",
+    "Patient's Name",
+    "Patient's Sex",
+    "Patient's Weight",
+    'Percent Phase Field of View',
+    'Percent Sampling',
+    'Performed Procedure Step Description',
+    'Performed Procedure Step Start Date',
+    'Performed Procedure Step Start Time',
+    'Photometric Interpretation',
+    'Pixel Bandwidth',
+    'Pixel Spacing',
+    'Procedure Code Sequence',
+    'Repetition Time',
+    'Requested Procedure Code Sequence',
+    'Requested Procedure Description',
+    'Rows',
+    'SAR',
+    'SOP Class UID',
+    'SOP Instance UID',
+    'Samples per Pixel',
+    'Scanning Sequence',
+    'Sequence Name',
+    'Sequence Variant',
+    'Series Date',
+    'Series Description',
+    'Series Instance UID',
+    'Series Number',
+    'Series Time',
+    'Slice Location',
+    'Slice Thickness',
+    'Software Versions',
+    'Spacing Between Slices',
+    'Study Comments',
+    'Study Date',
+    'Study Description',
+    'Study ID',
+    'Study Instance UID',
+    'Study Time',
+    'Time of Last Calibration',
+    'Timezone Offset From UTC',
+    'Transmit Coil Name',
+    'Variable Flip Angle Flag',
+    'Window Center',
+    'Window Center & Width Explanation',
+    'Window Width',
+)
+
+# Tag of each metadata column, looked up once in the DICOM data dictionary by name
+_TAGS_BY_NAME = {entry[2]: tag for tag, entry in DicomDictionary.items()}
+METADATA_TAGS = {column: _TAGS_BY_NAME[column] for column in METADATA_COLUMNS}
+
+# Tags parsed from uploaded files, pydicom skips over all other elements
+METADATA_TAG_WHITELIST = list(METADATA_TAGS.values())
+
+
+def get_connection_pool() -> ThreadedConnectionPool:
+    """
+    Returns the shared RDS connection pool, creating it on first use.
+
+    Returns:
+        ThreadedConnectionPool: The connection pool for the RDS instance.
+    """
+    global _pool
+    # Worker threads may ask for the pool at the same time, only one may create it
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                POOL_MIN_CONNECTIONS,
+                POOL_MAX_CONNECTIONS,
+                database=os.getenv("DATABASE"), 
+                user=os.getenv("USER"), 
+                password=os.getenv("PASSWORD"), 
+                host=os.getenv("HOST"), 
+                port=os.getenv("PORT")
+            )
+        return _pool
+
+
+class _ThreadedReader:
+    """
+    Wraps a binary file object so that aioboto3 reads it in a worker thread
+    instead of blocking the event loop on disk reads.
+
+    Args:
+        fileobj (BinaryIO): The file object to read from.
+    """
+    def __init__(self, fileobj: BinaryIO) -> None:
+        self._fileobj = fileobj
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.to_thread(self._fileobj.read, size)
+
 
 class AWSClient:
     def __init__(self, region_name, access_key_id, secret_access_key):
         self.region_name = region_name
         self.access_key_id = access_key_id
         self.secret_access_key = secret_access_key
-        self.s3_client = boto3.client(
+
+    # Clients are created on first use, constructing them loads botocore's service models
+    @functools.cached_property
+    def s3_client(self):
+        return boto3.client(
             's3',
             region_name=self.region_name,
             aws_access_key_id=self.access_key_id,
-            aws_secret_access_key=self.secret_access_key
+            aws_secret_access_key=self.secret_access_key,
+            config=S3_CLIENT_CONFIG
         )
-        self.rds_client = boto3.client(
+
+    @functools.cached_property
+    def rds_client(self):
+        return boto3.client(
             'rds',
             region_name=self.region_name,
             aws_access_key_id=self.access_key_id,
@@ -64,31 +268,72 @@ class DicomSaver(AWSClient):
     def __init__(self, s3_bucket: str, region_name: str, access_key_id: str, secret_access_key: str) -> None:
         super().__init__(region_name, access_key_id, secret_access_key)
         self.s3_bucket = s3_bucket
+        self._insert_query = self.create_insert_query(
+            table_name="public.dicom_metadata",
+            columns=METADATA_COLUMNS
+        )
+        self._rds_queue = None
+        self._rds_writer = None
+        self._rds_batch = []
+        self._transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=MAX_CONCURRENCY
+        )
+        self._s3_session = aioboto3.Session(
+            region_name=self.region_name,
+            aws_access_key_id=self.access_key_id,
+            aws_secret_access_key=self.secret_access_key
+        )
+        self._exit_stack = None
+        self._s3_async_client = None
 
+    async def start(self) -> None:
+        """
+        Opens the aioboto3 S3 client shared by all async uploads, so its connections
+        are reused, and starts the RDS batch writer. Must be awaited on the running
+        event loop before uploading.
+        """
+        self._rds_queue = asyncio.Queue()
+        self._rds_writer = asyncio.create_task(self._write_rds_batches())
+        self._exit_stack = AsyncExitStack()
+        self._s3_async_client = await self._exit_stack.enter_async_context(
+            self._s3_session.client('s3', config=S3_CLIENT_CONFIG)
+        )
 
-    def save_to_rds(self, dicom_metadata: dict, query: str) -> None:
+    async def close(self) -> None:
+        """
+        Saves the rows already queued, stops the RDS batch writer and closes the
+        aioboto3 S3 client opened by start.
         """
-        Connects to the RDS instance and saves DICOM metadata.
+        rds_writer = self._rds_writer
+        # No more rows are accepted, the writer flushes the queue up to the stop marker
+        self._rds_writer = None
+        if rds_writer is not None:
+            await self._rds_queue.put(_RDS_WRITER_STOP)
+            await asyncio.gather(rds_writer, return_exceptions=True)
+        self._rds_queue = None
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+        self._exit_stack = None
+        self._s3_async_client = None
+
+
+    def save_to_rds(self, dicom_metadata: List[Tuple[str]], query: str) -> None:
+        """
+        Connects to the RDS instance and saves DICOM metadata in a single round trip.
 
         Args:
-            dicom_metadata (dict): The DICOM metadata to be saved.
+            dicom_metadata (List[Tuple[str]]): The DICOM metadata rows to be saved.
             query (str): The SQL query to save the DICOM metadata.
         """
-        # Connect to RDS instance
+        # Borrow a connection to the RDS instance from the pool
+        pool = get_connection_pool()
+        conn = pool.getconn()
         try:
-            # Example: Connect to RDS
-            conn = psycopg2.connect(
-                database=os.getenv("DATABASE"), 
-                user=os.getenv("USER"), 
-                password=os.getenv("PASSWORD"), 
-                host=os.getenv("HOST"), 
-                port=os.getenv("PORT")
-            )
-            _logger.info("Connecting to local database")
-            cursor = conn.cursor()
-            
-            # Execute SQL query to save metadata
-            cursor.execute(query, dicom_metadata)
+            with conn.cursor() as cursor:
+                # Execute SQL query to save all metadata rows
+                execute_values(cursor, query, dicom_metadata, page_size=RDS_BATCH_SIZE)
             
             # Commit the transaction
             conn.commit()
@@ -96,70 +341,360 @@ class DicomSaver(AWSClient):
             _logger.info("DICOM metadata saved to RDS successfully.")
         except Exception as e:
             # Rollback in case of error
-            conn.rollback()
-            _logger.info(f"Error saving DICOM metadata to RDS: {e}")
+            if not conn.closed:
+                conn.rollback()
+            _logger.error(f"Error saving DICOM metadata to RDS: {e}")
+            raise
         finally:
-            # Close cursor and connection
-            cursor.close()
-            conn.close()
+            # Return connection to the pool, discarding it if it was closed
+            pool.putconn(conn, close=bool(conn.closed))
 
 
-    def save_to_s3(self, dicom_bytes: bytes, filename: str) -> None:
+    def save_to_s3(self, fileobj: BinaryIO, filename: str) -> None:
         """
-        Uploads DICOM bytes to the specified S3 bucket.
+        Uploads a DICOM file object to the specified S3 bucket.
 
         Args:
-            dicom_bytes (bytes): The DICOM file content as bytes.
+            fileobj (BinaryIO): The DICOM file content as a readable binary file object.
             filename (str): The filename to be used in S3.
         """
-        # Upload DICOM bytes to S3 bucket
-        self.s3_client.put_object(Bucket=self.s3_bucket, Key=filename + ".dcm", Body=dicom_bytes)
+        # Upload DICOM file from the beginning to S3 bucket, in parallel parts when large
+        fileobj.seek(0)
+        self.s3_client.upload_fileobj(
+            fileobj,
+            self.s3_bucket,
+            filename + ".dcm",
+            ExtraArgs=CHECKSUM_ARGS,
+            Config=self._transfer_config
+        )
+
+    async def save_to_rds_async(self, dicom_metadata: Tuple[str]) -> None:
+        """
+        Queues DICOM metadata to be saved to RDS with other pending rows, and waits
+        until its batch is saved.
 
-    def process_and_save(self, dicom_bytes: bytes, filename: str) -> None:
+        Args:
+            dicom_metadata (Tuple[str]): The DICOM metadata row to be saved.
+        """
+        if self._rds_writer is None:
+            raise RuntimeError("DicomSaver.start() must be awaited before saving to RDS")
+
+        saved = asyncio.get_running_loop().create_future()
+        await self._rds_queue.put((dicom_metadata, saved))
+        await saved
+
+    async def _write_rds_batches(self) -> None:
+        """
+        Collects queued metadata rows and saves them to RDS one batch at a time,
+        until close queues the stop marker.
+        """
+        # The batch being collected or saved is kept on self, so that rows already taken
+        # off the queue are failed below if the writer is cancelled
+        self._rds_batch = []
+        try:
+            running = True
+            while running:
+                running = await self._collect_rds_batch()
+                if self._rds_batch:
+                    await self._save_rds_batch(self._rds_batch)
+                self._rds_batch = []
+        except BaseException as e:
+            # Never leave callers waiting on rows this writer will not save
+            error = e if isinstance(e, Exception) else RuntimeError("RDS batch writer stopped")
+            pending, self._rds_batch = self._rds_batch, []
+            while not self._rds_queue.empty():
+                item = self._rds_queue.get_nowait()
+                if item is not _RDS_WRITER_STOP:
+                    pending.append(item)
+            for _, saved in pending:
+                if not saved.done():
+                    saved.set_exception(error)
+            raise
+
+    async def _collect_rds_batch(self) -> bool:
+        """
+        Waits for the first queued row, then for more rows until the batch is full or times
+        out, adding the (row, future) pairs to self._rds_batch.
+
+        Returns:
+            bool: False if the stop marker was reached, True otherwise.
+        """
+        loop = asyncio.get_running_loop()
+        item = await self._rds_queue.get()
+        deadline = loop.time() + RDS_BATCH_INTERVAL
+        while item is not _RDS_WRITER_STOP:
+            self._rds_batch.append(item)
+            timeout = deadline - loop.time()
+            if len(self._rds_batch) >= RDS_BATCH_SIZE or timeout <= 0:
+                return True
+            try:
+                item = await asyncio.wait_for(self._rds_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return True
+        return False
+
+    async def _save_rds_batch(self, batch: list) -> None:
+        """
+        Saves a batch of rows to RDS. If the batch fails, the rows are saved one by one
+        so that a bad row only fails its own upload.
+
+        Args:
+            batch (list): The (row, future) pairs in the batch.
+        """
+        # psycopg2 in a worker thread costs one thread hop per batch, not per row
+        rows = [dicom_metadata for dicom_metadata, _ in batch]
+        try:
+            await asyncio.to_thread(self.save_to_rds, rows, self._insert_query)
+        except Exception as e:
+            if len(batch) == 1:
+                results = [e]
+            else:
+                results = []
+                for dicom_metadata in rows:
+                    try:
+                        await asyncio.to_thread(self.save_to_rds, [dicom_metadata], self._insert_query)
+                        results.append(None)
+                    except Exception as row_error:
+                        results.append(row_error)
+        else:
+            results = [None] * len(batch)
+
+        for (_, saved), result in zip(batch, results):
+            if saved.done():
+                continue
+            if result is None:
+                saved.set_result(None)
+            else:
+                saved.set_exception(result)
+
+    async def save_to_s3_async(self, fileobj: BinaryIO, filename: str) -> None:
+        """
+        Uploads a DICOM file object to the specified S3 bucket without blocking the event loop.
+
+        Args:
+            fileobj (BinaryIO): The DICOM file content as a readable binary file object.
+            filename (str): The filename to be used in S3.
+        """
+        if self._s3_async_client is None:
+            raise RuntimeError("DicomSaver.start() must be awaited before uploading to S3")
+
+        key = filename + ".dcm"
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+
+        # Upload DICOM file from the beginning to S3 bucket, in concurrent parts when large
+        if size >= MULTIPART_THRESHOLD:
+            await self._upload_multipart_async(fileobj, key)
+            return
+
+        await self._s3_async_client.upload_fileobj(
+            _ThreadedReader(fileobj),
+            self.s3_bucket,
+            key,
+            ExtraArgs=CHECKSUM_ARGS,
+            Config=self._transfer_config
+        )
+
+    async def _upload_multipart_async(self, fileobj: BinaryIO, key: str) -> None:
+        """
+        Uploads a file object to S3 in concurrent parts, each verified by S3 with its CRC32C.
+        aioboto3's upload_fileobj leaves the part checksums out of CompleteMultipartUpload,
+        which S3 then rejects, so the parts are uploaded here instead.
+
+        Args:
+            fileobj (BinaryIO): The readable binary file object, positioned at its start.
+            key (str): The key of the object in S3.
+        """
+        client = self._s3_async_client
+        upload = await client.create_multipart_upload(Bucket=self.s3_bucket, Key=key, **CHECKSUM_ARGS)
+        upload_id = upload['UploadId']
+
+        def read_part() -> Tuple[bytes, str]:
+            body = fileobj.read(MULTIPART_CHUNKSIZE)
+            return body, crc32c_checksum(body)
+
+        async def upload_part(part_number: int, body: bytes, checksum: str) -> dict:
+            try:
+                response = await client.upload_part(
+                    Bucket=self.s3_bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body,
+                    ChecksumCRC32C=checksum
+                )
+                return {'ETag': response['ETag'], 'PartNumber': part_number, 'ChecksumCRC32C': checksum}
+            finally:
+                slots.release()
+
+        # At most MAX_CONCURRENCY parts are read into memory and uploading at a time
+        slots = asyncio.Semaphore(MAX_CONCURRENCY)
+        uploads = []
+        try:
+            while True:
+                await slots.acquire()
+                # Reading and checksumming a part runs in a worker thread
+                body, checksum = await asyncio.to_thread(read_part)
+                if not body:
+                    slots.release()
+                    break
+                uploads.append(asyncio.create_task(upload_part(len(uploads) + 1, body, checksum)))
+                # Stop reading as soon as a part fails
+                if any(task.done() and task.exception() for task in uploads):
+                    break
+            parts = await asyncio.gather(*uploads)
+
+            await client.complete_multipart_upload(
+                Bucket=self.s3_bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except BaseException:
+            for task in uploads:
+                task.cancel()
+            await asyncio.gather(*uploads, return_exceptions=True)
+            # Abort so S3 does not keep the uploaded parts, without hiding the original error
+            try:
+                await client.abort_multipart_upload(Bucket=self.s3_bucket, Key=key, UploadId=upload_id)
+            except Exception as e:
+                _logger.error(f"Error aborting multipart upload of {key}: {e}")
+            raise
+
+    async def save_metadata_from_s3_async(self, filename: str) -> None:
+        """
+        Reads the metadata of a DICOM file already stored in S3 and saves it to RDS.
+        Meant to run after the upload has been answered, so errors are logged.
+
+        Args:
+            filename (str): The filename used in S3.
+        """
+        try:
+            data = await self.read_metadata_from_s3_async(filename)
+            await self.save_to_rds_async(data)
+        except Exception as e:
+            _logger.error(f"Error saving metadata of {filename} to RDS: {e}")
+
+    async def read_metadata_from_s3_async(self, filename: str) -> Tuple[str]:
+        """
+        Reads the metadata of a DICOM file stored in S3, fetching only the start of the
+        file when the metadata ends within it.
+
+        Args:
+            filename (str): The filename used in S3.
+
+        Returns:
+            Tuple[str]: The metadata row, in METADATA_COLUMNS order.
+        """
+        key = filename + ".dcm"
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as fileobj:
+            downloaded, size = await self._download_async(
+                key, fileobj, Range=f"bytes=0-{METADATA_PREFIX_BYTES - 1}"
+            )
+            if downloaded >= size:
+                return await asyncio.to_thread(self.prepare_metadata, fileobj)
+
+            # The metadata is complete if pydicom stopped at the pixel data within the prefix
+            try:
+                data = await asyncio.to_thread(self.prepare_metadata, fileobj)
+                if fileobj.tell() < downloaded:
+                    return data
+            except Exception:
+                pass
+
+        # Otherwise read it from the whole file
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as fileobj:
+            await self._download_async(key, fileobj)
+            return await asyncio.to_thread(self.prepare_metadata, fileobj)
+
+    async def _download_async(self, key: str, fileobj: BinaryIO, **kwargs) -> Tuple[int, int]:
+        """
+        Downloads an S3 object, or the range given in kwargs, into a file object and rewinds it.
+
+        Args:
+            key (str): The key of the object in S3.
+            fileobj (BinaryIO): The writable binary file object to download into.
+
+        Returns:
+            Tuple[int, int]: The number of bytes downloaded and the size of the whole object.
+        """
+        if self._s3_async_client is None:
+            raise RuntimeError("DicomSaver.start() must be awaited before downloading from S3")
+
+        response = await self._s3_async_client.get_object(Bucket=self.s3_bucket, Key=key, **kwargs)
+        downloaded = 0
+        async with response['Body'] as body:
+            while chunk := await body.read(DOWNLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(fileobj.write, chunk)
+                downloaded += len(chunk)
+        fileobj.seek(0)
+
+        # Ranged responses give the object size after the slash of "bytes 0-99/1000"
+        content_range = response.get('ContentRange')
+        size = int(content_range.rsplit('/', 1)[1]) if content_range else downloaded
+        return downloaded, size
+
+    def process_and_save(self, fileobj: BinaryIO, filename: str) -> None:
         """
         Extracts DICOM metadata, saves it to RDS, and saves the DICOM file to S3.
 
         Args:
-            dicom_bytes (bytes): The DICOM file content as bytes.
+            fileobj (BinaryIO): The DICOM file content as a readable binary file object.
             filename (str): The filename to be used in S3.
         """
         # Extract DICOM metadata
-        dicom_data = pydicom.dcmread(io.BytesIO(dicom_bytes))
-        metadata = self.read_dicom_metadata(dicom_data)
-        data = self.PrepareData(metadata)
-        
-        # Save metadata to RDS
-        query = self.create_insert_query(
-            table_name="public.dicom_metadata",
-            values=metadata
-        )
+        data = self.prepare_metadata(fileobj)
         
         # Save information 
-        self.save_to_rds(data, query)
+        self.save_to_rds([data], self._insert_query)
         
         # Save DICOM file to S3
-        self.save_to_s3(dicom_bytes, filename)
+        self.save_to_s3(fileobj, filename)
+
+    def prepare_metadata(self, fileobj: BinaryIO) -> Tuple[str]:
+        """
+        Reads a DICOM file and builds the row used to save its metadata.
+
+        Args:
+            fileobj (BinaryIO): The DICOM file content as a readable binary file object.
+
+        Returns:
+            Tuple[str]: The metadata row, in METADATA_COLUMNS order.
+        """
+        # Parse only the saved tags and stop reading at the pixel data. defer_size is
+        # not used, pydicom can only read deferred values again from a file path and
+        # fails on the spooled upload
+        dicom_data = pydicom.dcmread(
+            fileobj,
+            stop_before_pixels=True,
+            specific_tags=METADATA_TAG_WHITELIST
+        )
+        metadata = self.read_dicom_metadata(dicom_data)
+        return self.PrepareData(metadata)
 
     def read_dicom_metadata(self, dicom_data: pydicom.dataset.FileDataset) -> dict:
         """
-        Reads all the data in the DICOM metadata.
+        Reads the data in the DICOM metadata that is saved to RDS.
 
         Args:
             dicom_data (pydicom.dataset.FileDataset): The DICOM dataset.
 
         Returns:
-            dict: A dictionary containing all the data in the DICOM metadata.
+            dict: A dictionary containing the data of each metadata column present in the file.
         """
         dicom_metadata = {}
-        for element in dicom_data:
+        # Look up only the saved columns instead of converting every element in the file
+        for column, tag in METADATA_TAGS.items():
+            element = dicom_data.get(tag)
             # Check if the element has a value
-            if element.value:
-                # Convert the value to a string and store it in the dictionary
-                dicom_metadata[element.name] = str(element.value)
-        del dicom_metadata["Pixel Data"]
+            if element is not None and element.value:
+                # Convert the value to a string and store it in the dictionary. Sequence
+                # columns are stored as the string of the whole sequence, items included
+                dicom_metadata[column] = str(element.value)
         return dicom_metadata
     
-    def PrepareData(self, mergedData) -> List[Tuple[str]]:
+    def PrepareData(self, mergedData) -> Tuple[str]:
         """
         
 
@@ -167,192 +702,12 @@ class DicomSaver(AWSClient):
             mergedData (_type_): _description_
 
         Returns:
-            List[Tuple[str]]: _description_
-        """
-        # Extract relevant information
-        accession_number = mergedData.get('Accession Number', '')
-        acquisition_date = mergedData.get('Acquisition Date', '')
-        acquisition_matrix = mergedData.get('Acquisition Matrix', '')
-        acquisition_number = mergedData.get('Acquisition Number', '')
-        acquisition_time = mergedData.get('Acquisition Time', '')
-        angio_flag = mergedData.get('Angio Flag', '')
-        bits_allocated = mergedData.get('Bits Allocated', '')
-        bits_stored = mergedData.get('Bits Stored', '')
-        columns = mergedData.get('Columns', '')
-        content_date = mergedData.get('Content Date', '')
-        content_time = mergedData.get('Content Time', '')
-        date_of_last_calibration = mergedData.get('Date of Last Calibration', '')
-        deidentification_method = mergedData.get('De-identification Method', '')
-        derivation_description = mergedData.get('Derivation Description', '')
-        echo_time = mergedData.get('Echo Time', '')
-        echo_train_length = mergedData.get('Echo Train Length', '')
-        flip_angle = mergedData.get('Flip Angle', '')
-        frame_of_reference_uid = mergedData.get('Frame of Reference UID', '')
-        high_bit = mergedData.get('High Bit', '')
-        image_comments = mergedData.get('Image Comments', '')
-        image_orientation_patient = mergedData.get('Image Orientation (Patient)', '')
-        image_position_patient = mergedData.get('Image Position (Patient)', '')
-        image_type = mergedData.get('Image Type', '')
-        imaged_nucleus = mergedData.get('Imaged Nucleus', '')
-        imaging_frequency = mergedData.get('Imaging Frequency', '')
-        in_plane_phase_encoding_direction = mergedData.get('In-plane Phase Encoding Direction', '')
-        instance_creation_date = mergedData.get('Instance Creation Date', '')
-        instance_creation_time = mergedData.get('Instance Creation Time', '')
-        instance_creator_uid = mergedData.get('Instance Creator UID', '')
-        instance_number = mergedData.get('Instance Number', '')
-        largest_image_pixel_value = mergedData.get('Largest Image Pixel Value', '')
-        lossy_image_compression = mergedData.get('Lossy Image Compression', '')
-        lossy_image_compression_ratio = mergedData.get('Lossy Image Compression Ratio', '')
-        mr_acquisition_type = mergedData.get('MR Acquisition Type', '')
-        magnetic_field_strength = mergedData.get('Magnetic Field Strength', '')
-        manufacturer = mergedData.get('Manufacturer', '')
-        manufacturer_model_name = mergedData.get("Manufacturer's Model Name", '')
-        modality = mergedData.get('Modality', '')
-        number_of_averages = mergedData.get('Number of Averages', '')
-        number_of_phase_encoding_steps = mergedData.get('Number of Phase Encoding Steps', '')
-        patient_id = mergedData.get('Patient ID', '')
-        patient_identity_removed = mergedData.get('Patient Identity Removed', '')
-        patient_position = mergedData.get('Patient Position', '')
-        patient_age = mergedData.get("Patient's Age", '')
-        patient_name = mergedData.get("Patient's Name", '')
-        patient_sex = mergedData.get("Patient's Sex", '')
-        patient_weight = mergedData.get("Patient's Weight", '')
-        percent_phase_field_of_view = mergedData.get('Percent Phase Field of View', '')
-        percent_sampling = mergedData.get('Percent Sampling', '')
-        performed_procedure_step_description = mergedData.get('Performed Procedure Step Description', '')
-        performed_procedure_step_start_date = mergedData.get('Performed Procedure Step Start Date', '')
-        performed_procedure_step_start_time = mergedData.get('Performed Procedure Step Start Time', '')
-        photometric_interpretation = mergedData.get('Photometric Interpretation', '')
-        pixel_bandwidth = mergedData.get('Pixel Bandwidth', '')
-        pixel_spacing = mergedData.get('Pixel Spacing', '')
-        procedure_code_sequence = mergedData.get('Procedure Code Sequence', '')
-        repetition_time = mergedData.get('Repetition Time', '')
-        requested_procedure_code_sequence = mergedData.get('Requested Procedure Code Sequence', '')
-        requested_procedure_description = mergedData.get('Requested Procedure Description', '')
-        rows = mergedData.get('Rows', '')
-        sar = mergedData.get('SAR', '')
-        sop_class_uid = mergedData.get('SOP Class UID', '')
-        sop_instance_uid = mergedData.get('SOP Instance UID', '')
-        samples_per_pixel = mergedData.get('Samples per Pixel', '')
-        scanning_sequence = mergedData.get('Scanning Sequence', '')
-        sequence_name = mergedData.get('Sequence Name', '')
-        sequence_variant = mergedData.get('Sequence Variant', '')
-        series_date = mergedData.get('Series Date', '')
-        series_description = mergedData.get('Series Description', '')
-        series_instance_uid = mergedData.get('Series Instance UID', '')
-        series_number = mergedData.get('Series Number', '')
-        series_time = mergedData.get('Series Time', '')
-        slice_location = mergedData.get('Slice Location', '')
-        slice_thickness = mergedData.get('Slice Thickness', '')
-        software_versions = mergedData.get('Software Versions', '')
-        spacing_between_slices = mergedData.get('Spacing Between Slices', '')
-        study_comments = mergedData.get('Study Comments', '')
-        study_date = mergedData.get('Study Date', '')
-        study_description = mergedData.get('Study Description', '')
-        study_id = mergedData.get('Study ID', '')
-        study_instance_uid = mergedData.get('Study Instance UID', '')
-        study_time = mergedData.get('Study Time', '')
-        time_of_last_calibration = mergedData.get('Time of Last Calibration', '')
-        timezone_offset_from_utc = mergedData.get('Timezone Offset From UTC', '')
-        transmit_coil_name = mergedData.get('Transmit Coil Name', '')
-        variable_flip_angle_flag = mergedData.get('Variable Flip Angle Flag', '')
-        window_center = mergedData.get('Window Center', '')
-        window_center_width_explanation = mergedData.get('Window Center & Width Explanation', '')
-        window_width = mergedData.get('Window Width', '')
-        
-        invoice_tuple_data = (
-            accession_number,
-            acquisition_date,
-            acquisition_matrix,
-            acquisition_number,
-            acquisition_time,
-            angio_flag,
-            bits_allocated,
-            bits_stored,
-            columns,
-            content_date,
-            content_time,
-            date_of_last_calibration,
-            deidentification_method,
-            derivation_description,
-            echo_time,
-            echo_train_length,
-            flip_angle,
-            frame_of_reference_uid,
-            high_bit,
-            image_comments,
-            image_orientation_patient,
-            image_position_patient,
-            image_type,
-            imaged_nucleus,
-            imaging_frequency,
-            in_plane_phase_encoding_direction,
-            instance_creation_date,
-            instance_creation_time,
-            instance_creator_uid,
-            instance_number,
-            largest_image_pixel_value,
-            lossy_image_compression,
-            lossy_image_compression_ratio,
-            mr_acquisition_type,
-            magnetic_field_strength,
-            manufacturer,
-            manufacturer_model_name,
-            modality,
-            number_of_averages,
-            number_of_phase_encoding_steps,
-            patient_id,
-            patient_identity_removed,
-            patient_position,
-            patient_age,
-            patient_name,
-            patient_sex,
-            patient_weight,
-            percent_phase_field_of_view,
-            percent_sampling,
-            performed_procedure_step_description,
-            performed_procedure_step_start_date,
-            performed_procedure_step_start_time,
-            photometric_interpretation,
-            pixel_bandwidth,
-            pixel_spacing,
-            procedure_code_sequence,
-            repetition_time,
-            requested_procedure_code_sequence,
-            requested_procedure_description,
-            rows,
-            sar,
-            sop_class_uid,
-            sop_instance_uid,
-            samples_per_pixel,
-            scanning_sequence,
-            sequence_name,
-            sequence_variant,
-            series_date,
-            series_description,
-            series_instance_uid,
-            series_number,
-            series_time,
-            slice_location,
-            slice_thickness,
-            software_versions,
-            spacing_between_slices,
-            study_comments,
-            study_date,
-            study_description,
-            study_id,
-            study_instance_uid,
-            study_time,
-            time_of_last_calibration,
-            timezone_offset_from_utc,
-            transmit_coil_name,
-            variable_flip_angle_flag,
-            window_center,
-            window_center_width_explanation,
-            window_width
-        )
+            Tuple[str]: _description_
+        """
+        # Extract relevant information in column order
+        row = tuple(mergedData.get(column, '') for column in METADATA_COLUMNS)
 
-        return self.replace_empty_with_null(invoice_tuple_data)
+        return self.replace_empty_with_null(row)
 
     def replace_empty_with_null(self, input_tuple):
         """
@@ -367,18 +722,17 @@ class DicomSaver(AWSClient):
         return tuple(None if value == '' else value for value in input_tuple)
     
     @staticmethod
-    def create_insert_query(table_name: str, values: dict) -> str:
+    def create_insert_query(table_name: str, columns: Tuple[str]) -> str:
         """
-        Creates an SQL insert query.
+        Creates an SQL insert query for use with psycopg2.extras.execute_values.
 
         Args:
             table_name (str): The name of the table to insert into.
-            values (dict): A dictionary containing column names as keys and corresponding values to insert.
+            columns (Tuple[str]): The column names to insert values into.
 
         Returns:
             str: The SQL insert query.
         """
-        columns = ', '.join([f'"{col}"' for col in values.keys()])
-        placeholders = ', '.join(['%s'] * len(values))
-        query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+        column_names = ', '.join([f'"{col}"' for col in columns])
+        query = f"INSERT INTO {table_name} ({column_names}) VALUES %s"
         return query